@@ -8,7 +8,8 @@ import numpy as np
 import plotly.graph_objects as go
 import time
 
-from simulador_sag import SimuladorSAG, crear_parametros_default
+from simulador_sag import SimuladorSAG, crear_parametros_default, precompilar_kernels
+from submuestreo import indices_lttb, precompilar_lttb
 
 # ================= CONFIGURACIÓN =================
 st.set_page_config(
@@ -17,7 +18,33 @@ st.set_page_config(
     layout="wide"
 )
 
+# Periodo mínimo entre refrescos de los paneles en vivo (s). A velocidades
+# altas se agrupan varios pasos por refresco en lugar de uno por paso.
+PERIODO_REFRESCO = 0.5
+
+# Máximo de puntos por traza enviados al navegador (submuestreo LTTB)
+PUNTOS_MAX_GRAFICO = 500
+
+# Decimales con que se envían los datos de las trazas: sobran para los ejes
+# y los hovers, y reducen a menos de la mitad el JSON de cada gráfico
+DECIMALES_GRAFICO = 4
+
+# Claves de los sliders de los formularios (se descartan al reiniciar)
+CLAVES_SLIDERS = (
+    'slider_flujo', 'slider_ley',
+    'slider_k', 'slider_recirc', 'slider_tau_rec', 'slider_tau_finos',
+    'slider_tau_F', 'slider_tau_L', 'slider_amp_ley', 'slider_amp_flujo'
+)
+
 # ================= INICIALIZACIÓN =================
+@st.cache_resource(show_spinner="Compilando kernels numéricos...")
+def precompilar():
+    """Compila los kernels Numba una sola vez por proceso del servidor"""
+    precompilar_kernels()
+    precompilar_lttb()
+
+precompilar()
+
 if 'simulador' not in st.session_state:
     params = crear_parametros_default()
     st.session_state.simulador = SimuladorSAG(params)
@@ -27,6 +54,10 @@ if 'simulador' not in st.session_state:
     st.session_state.velocidad_sim = 0.5
 
 # ================= FUNCIONES DE CONTROL =================
+def pasos_por_ciclo():
+    """Pasos de simulación a ejecutar en cada refresco según la velocidad elegida"""
+    return max(1, round(PERIODO_REFRESCO / st.session_state.velocidad_sim))
+
 def iniciar_simulacion():
     st.session_state.simulando = True
 
@@ -39,11 +70,28 @@ def reiniciar_simulacion():
     st.session_state.simulando = False
     st.session_state.pasos_ejecutados = 0
     st.session_state.hora_inicio = time.time()
+    st.session_state.pop('claves_graficos', None)
+    st.session_state.pop('resumen_estado', None)
+    for clave in CLAVES_SLIDERS:
+        st.session_state.pop(clave, None)
 
-# ================= EJECUTAR PASO =================
-if st.session_state.simulando:
-    st.session_state.simulador.paso_simulacion()
-    st.session_state.pasos_ejecutados += 1
+# Los formularios escriben en el simulador solo desde estos callbacks, al
+# confirmarse, y no en cada rerun
+def aplicar_objetivos():
+    sim = st.session_state.simulador
+    sim.actualizar_objetivo('F', st.session_state.slider_flujo)
+    sim.actualizar_objetivo('L', st.session_state.slider_ley / 100.0)
+
+def aplicar_parametros():
+    sim = st.session_state.simulador
+    sim.params['k_descarga'] = st.session_state.slider_k
+    sim.params['fraccion_recirculacion'] = st.session_state.slider_recirc / 100.0
+    sim.params['tau_recirculacion'] = st.session_state.slider_tau_rec
+    sim.params['tau_finos'] = st.session_state.slider_tau_finos
+    sim.tau_F = st.session_state.slider_tau_F
+    sim.tau_L = st.session_state.slider_tau_L
+    sim.amplitud_variacion_ley = st.session_state.slider_amp_ley / 100.0
+    sim.amplitud_variacion_flujo = st.session_state.slider_amp_flujo / 100.0
 
 # ================= INTERFAZ PRINCIPAL =================
 st.title("🏭 Simulador Planta Concentradora - Molino SAG")
@@ -98,438 +146,566 @@ with st.sidebar:
     # ========== OBJETIVOS DE OPERACIÓN ==========
     st.subheader("🎯 **Objetivos de Operación**")
     
-    F_obj = st.slider(
-        "**Flujo objetivo (t/h)**",
-        500.0, 5000.0, 
-        float(st.session_state.simulador.objetivos['F_target']),
-        step=100.0,
-        key="slider_flujo",
-        help="Objetivo de flujo de alimentación al molino SAG"
-    )
-    st.session_state.simulador.actualizar_objetivo('F', F_obj)
-    
-    L_obj = st.slider(
-        "**Ley objetivo (%)**",
-        0.3, 1.5,
-        float(st.session_state.simulador.objetivos['L_target'] * 100),
-        step=0.05,
-        format="%.2f",
-        key="slider_ley",
-        help="Objetivo de ley de cobre en la alimentación"
-    )
-    st.session_state.simulador.actualizar_objetivo('L', L_obj / 100.0)
+    # Los objetivos se aplican juntos al confirmar el formulario, evitando
+    # un rerun completo por cada movimiento de slider
+    with st.form("form_objetivos"):
+        st.slider(
+            "**Flujo objetivo (t/h)**",
+            500.0, 5000.0, 
+            float(st.session_state.simulador.objetivos['F_target']),
+            step=100.0,
+            key="slider_flujo",
+            help="Objetivo de flujo de alimentación al molino SAG"
+        )
+        
+        st.slider(
+            "**Ley objetivo (%)**",
+            0.3, 1.5,
+            float(st.session_state.simulador.objetivos['L_target'] * 100),
+            step=0.05,
+            format="%.2f",
+            key="slider_ley",
+            help="Objetivo de ley de cobre en la alimentación"
+        )
+        
+        st.form_submit_button("✅ Aplicar objetivos",
+                              on_click=aplicar_objetivos,
+                              use_container_width=True)
     
     st.markdown("---")
     
     # ========== PARÁMETROS AVANZADOS ==========
     with st.expander("⚙️ **Parámetros Avanzados**"):
         
-        st.subheader("🏗️ Parámetros del Sistema")
-        
-        k_valor = st.slider(
-            "Constante de descarga (k) [1/hora]",
-            0.1, 2.0,
-            float(st.session_state.simulador.params['k_descarga']),
-            0.1,
-            help="k = Descarga / Masa. Valores más altos = respuesta más rápida del SAG"
-        )
-        st.session_state.simulador.params['k_descarga'] = k_valor
-        
-        recirc = st.slider(
-            "Recirculación (%)",
-            1.0, 20.0,
-            float(st.session_state.simulador.params['fraccion_recirculacion'] * 100),
-            1.0,
-            format="%.1f"
-        )
-        st.session_state.simulador.params['fraccion_recirculacion'] = recirc / 100.0
-        
-        tau_rec = st.slider(
-            "Retardo recirculación (min)",
-            0, 30,
-            int(st.session_state.simulador.params['tau_recirculacion']),
-            step=1
-        )
-        st.session_state.simulador.params['tau_recirculacion'] = tau_rec
-        
-        tau_finos = st.slider(
-            "Retardo finos (min)",
-            0, 300,
-            int(st.session_state.simulador.params['tau_finos']),
-            step=10
-        )
-        st.session_state.simulador.params['tau_finos'] = tau_finos
-        
-        st.markdown("---")
-        
-        # ========== DINÁMICA DEL CHANCADO ==========
-        st.subheader("⏱️ Dinámica del Chancado")
-        
-        # CAMBIO IMPORTANTE: Rangos más realistas
-        tau_F = st.slider(
-            "τ flujo (horas)",
-            0.1, 2.0,  # De 0.1 a 2 horas (más realista)
-            float(st.session_state.simulador.tau_F),
-            0.1,
-            help="Tiempo para alcanzar 63% del objetivo. Más bajo = respuesta más rápida"
-        )
-        st.session_state.simulador.tau_F = tau_F
-        
-        tau_L = st.slider(
-            "τ ley (horas)",
-            0.5, 3.0,  # De 0.5 a 3 horas
-            float(st.session_state.simulador.tau_L),
-            0.1,
-            help="Tiempo para alcanzar 63% del objetivo de ley"
-        )
-        st.session_state.simulador.tau_L = tau_L
-        
-        st.markdown("---")
-        
-        # ========== VARIABILIDAD ==========
-        st.subheader("📊 Variabilidad Natural")
-        
-        amp_ley = st.slider(
-            "Amplitud variación ley (%)",
-            0.0, 5.0,
-            float(st.session_state.simulador.amplitud_variacion_ley * 100),
-            0.1,
-            format="%.1f",
-            help="Variación máxima de la ley (± porcentaje)"
-        )
-        st.session_state.simulador.amplitud_variacion_ley = amp_ley / 100.0
-        
-        amp_flujo = st.slider(
-            "Amplitud variación flujo (%)",
-            0.0, 2.0,
-            float(st.session_state.simulador.amplitud_variacion_flujo * 100),
-            0.1,
-            format="%.1f",
-            help="Variación máxima del flujo (± porcentaje)"
-        )
-        st.session_state.simulador.amplitud_variacion_flujo = amp_flujo / 100.0
+        with st.form("form_parametros"):
+            st.subheader("🏗️ Parámetros del Sistema")
+            
+            st.slider(
+                "Constante de descarga (k) [1/hora]",
+                0.1, 2.0,
+                float(st.session_state.simulador.params['k_descarga']),
+                0.1,
+                key="slider_k",
+                help="k = Descarga / Masa. Valores más altos = respuesta más rápida del SAG"
+            )
+            
+            st.slider(
+                "Recirculación (%)",
+                1.0, 20.0,
+                float(st.session_state.simulador.params['fraccion_recirculacion'] * 100),
+                1.0,
+                format="%.1f",
+                key="slider_recirc"
+            )
+            
+            st.slider(
+                "Retardo recirculación (min)",
+                0, 30,
+                int(st.session_state.simulador.params['tau_recirculacion']),
+                step=1,
+                key="slider_tau_rec"
+            )
+            
+            st.slider(
+                "Retardo finos (min)",
+                0, 300,
+                int(st.session_state.simulador.params['tau_finos']),
+                step=10,
+                key="slider_tau_finos"
+            )
+            
+            st.markdown("---")
+            
+            # ========== DINÁMICA DEL CHANCADO ==========
+            st.subheader("⏱️ Dinámica del Chancado")
+            
+            # CAMBIO IMPORTANTE: Rangos más realistas
+            st.slider(
+                "τ flujo (horas)",
+                0.1, 2.0,  # De 0.1 a 2 horas (más realista)
+                float(st.session_state.simulador.tau_F),
+                0.1,
+                key="slider_tau_F",
+                help="Tiempo para alcanzar 63% del objetivo. Más bajo = respuesta más rápida"
+            )
+            
+            st.slider(
+                "τ ley (horas)",
+                0.5, 3.0,  # De 0.5 a 3 horas
+                float(st.session_state.simulador.tau_L),
+                0.1,
+                key="slider_tau_L",
+                help="Tiempo para alcanzar 63% del objetivo de ley"
+            )
+            
+            st.markdown("---")
+            
+            # ========== VARIABILIDAD ==========
+            st.subheader("📊 Variabilidad Natural")
+            
+            st.slider(
+                "Amplitud variación ley (%)",
+                0.0, 5.0,
+                float(st.session_state.simulador.amplitud_variacion_ley * 100),
+                0.1,
+                format="%.1f",
+                key="slider_amp_ley",
+                help="Variación máxima de la ley (± porcentaje)"
+            )
+            
+            st.slider(
+                "Amplitud variación flujo (%)",
+                0.0, 2.0,
+                float(st.session_state.simulador.amplitud_variacion_flujo * 100),
+                0.1,
+                format="%.1f",
+                key="slider_amp_flujo",
+                help="Variación máxima del flujo (± porcentaje)"
+            )
+            
+            st.form_submit_button("✅ Aplicar parámetros",
+                                  on_click=aplicar_parametros,
+                                  use_container_width=True)
     
     st.markdown("---")
+
+# ================= GRÁFICOS =================
+# Las figuras se construyen una sola vez por sesión; en cada refresco solo se
+# reemplazan los datos x/y de sus trazas. Con uirevision fijo el navegador
+# conserva el zoom y las trazas ocultadas por el usuario entre refrescos.
+def serie(t, y):
+    """
+    Datos x/y de una traza, reducidos con LTTB a PUNTOS_MAX_GRAFICO y
+    redondeados a DECIMALES_GRAFICO
+    """
+    idx = indices_lttb(t, y, PUNTOS_MAX_GRAFICO)
+    return dict(x=np.round(t[idx], DECIMALES_GRAFICO),
+                y=np.round(y[idx], DECIMALES_GRAFICO))
+
+# Layouts de las figuras, compartidos como constantes de módulo
+LAYOUT_COMUN = dict(
+    height=300,
+    xaxis_title="Tiempo (horas)",
+    showlegend=True,
+    hovermode='x unified',
+    uirevision='sag',
+    margin=dict(l=20, r=20, t=40, b=20)
+)
+
+LAYOUT_BALANCE = dict(
+    LAYOUT_COMUN,
+    title="Balance de Sólidos",
+    yaxis_title="Flujo (t/h)",
+    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+)
+
+LAYOUT_MASAS = dict(
+    LAYOUT_COMUN,
+    title="Masas en Molino SAG",
+    yaxis_title="Masa (toneladas)"
+)
+
+LAYOUT_LEYES = dict(
+    LAYOUT_COMUN,
+    title="Comparación de Leyes",
+    yaxis_title="Ley (%)"
+)
+
+LAYOUT_COBRE = dict(
+    LAYOUT_COMUN,
+    title="Flujos de Cobre",
+    yaxis_title="Flujo Cobre (t/h)"
+)
+
+def crear_figura_balance():
+    fig = go.Figure()
     
-    # ========== ESTADO ACTUAL ==========
-    st.subheader("📊 **Estado Actual**")
-    estado_actual = st.session_state.simulador.obtener_estado()
-    historial = st.session_state.simulador.obtener_historial()
+    fig.add_trace(go.Scattergl(
+        name='Chancado', line=dict(color='blue', width=2),
+        hovertemplate='%{y:.0f} t/h<extra>Chancado</extra>'
+    ))
     
-    col1, col2 = st.columns(2)
-    with col1:
-        st.metric("Tiempo simulado", f"{estado_actual['t']:.1f} h")
-        st.metric("Flujo actual", f"{estado_actual['F_actual']:.0f} t/h")
-        st.metric("Masa SAG", f"{estado_actual['M_sag']:.0f} t")
+    fig.add_trace(go.Scattergl(
+        name='Finos', line=dict(color='green', width=2),
+        hovertemplate='%{y:.0f} t/h<extra>Finos</extra>'
+    ))
     
-    with col2:
-        st.metric("Ley actual", f"{estado_actual['L_actual']*100:.2f} %")
-        st.metric("Humedad SAG", f"{estado_actual['H_sag']*100:.1f} %")
-        
-        if historial['F_finos'] and len(historial['F_finos']) > 0:
-            st.metric("Finos actuales", f"{historial['F_finos'][-1]:.0f} t/h")
-        else:
-            st.metric("Finos actuales", "0 t/h")
+    fig.add_trace(go.Scattergl(
+        name='Sobretamaño', line=dict(color='red', width=2),
+        hovertemplate='%{y:.0f} t/h<extra>Sobretamaño</extra>'
+    ))
     
-    # Indicador de equilibrio
-    if historial['F_chancado'] and len(historial['F_chancado']) > 0:
-        F_chancado_actual = historial['F_chancado'][-1]
-        F_sobre_actual = historial['F_sobre_tamano'][-1] if historial['F_sobre_tamano'] and len(historial['F_sobre_tamano']) > 0 else 0
-        F_descarga_actual = historial['F_descarga'][-1] if historial['F_descarga'] and len(historial['F_descarga']) > 0 else 0
-        
-        balance = F_chancado_actual + F_sobre_actual - F_descarga_actual
-        
-        if abs(balance) < 50:
-            color = "🟢"
-            texto = f"{color} Balance: {balance:.0f} t/h (Estable)"
-        elif abs(balance) < 200:
-            color = "🟡"
-            texto = f"{color} Balance: {balance:.0f} t/h (Moderado)"
-        else:
-            color = "🔴"
-            texto = f"{color} Balance: {balance:.0f} t/h (Inestable)"
-        
-        equilibrio = min(abs(balance) / max(F_chancado_actual, 1), 1.0)
-        st.progress(equilibrio, text=texto)
+    fig.add_trace(go.Scattergl(
+        name='Objetivo', line=dict(color='black', width=2, dash='dash'),
+        hovertemplate='%{y:.0f} t/h<extra>Objetivo</extra>'
+    ))
+    
+    fig.update_layout(**LAYOUT_BALANCE)
+    
+    return fig
 
-# ================= GRÁFICOS =================
-def crear_grafico_balance(historial):
+def actualizar_grafico_balance(fig, historial):
+    t = historial['t']
+    
+    fig.data[0].update(serie(t, historial['F_chancado']))
+    fig.data[1].update(serie(t, historial['F_finos']))
+    fig.data[2].update(serie(t, historial['F_sobre_tamano']))
+    fig.data[3].update(serie(t, historial['F_target']))
+
+def crear_figura_masas():
     fig = go.Figure()
     
-    t = np.array(historial['t'])
+    fig.add_trace(go.Scattergl(
+        name='Masa Real', line=dict(color='blue', width=3),
+        hovertemplate='%{y:.0f} t<extra>Masa Real</extra>'
+    ))
     
-    if len(t) > 1:
-        fig.add_trace(go.Scatter(
-            x=t, y=historial['F_chancado'],
-            name='Chancado', line=dict(color='blue', width=2),
-            hovertemplate='%{y:.0f} t/h<extra>Chancado</extra>'
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=t, y=historial['F_finos'],
-            name='Finos', line=dict(color='green', width=2),
-            hovertemplate='%{y:.0f} t/h<extra>Finos</extra>'
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=t, y=historial['F_sobre_tamano'],
-            name='Sobretamaño', line=dict(color='red', width=2),
-            hovertemplate='%{y:.0f} t/h<extra>Sobretamaño</extra>'
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=t, y=historial['F_target'],
-            name='Objetivo', line=dict(color='black', width=2, dash='dash'),
-            hovertemplate='%{y:.0f} t/h<extra>Objetivo</extra>'
-        ))
-    
-    fig.update_layout(
-        height=300,
-        title="Balance de Sólidos",
-        xaxis_title="Tiempo (horas)",
-        yaxis_title="Flujo (t/h)",
-        showlegend=True,
-        hovermode='x unified',
-        margin=dict(l=20, r=20, t=40, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
+    fig.add_trace(go.Scattergl(
+        name='Masa Teórica', line=dict(color='gray', width=2, dash='dash'),
+        hovertemplate='%{y:.0f} t<extra>Masa Teórica</extra>'
+    ))
+    
+    fig.add_trace(go.Scattergl(
+        name='Agua', line=dict(color='cyan', width=2),
+        hovertemplate='%{y:.0f} t<extra>Agua</extra>'
+    ))
+    
+    fig.update_layout(**LAYOUT_MASAS)
     
     return fig
 
-def crear_grafico_masas(historial):
+def actualizar_grafico_masas(fig, historial):
+    t = historial['t']
+    
+    fig.data[0].update(serie(t, historial['M_sag']))
+    fig.data[1].update(serie(t, historial['M_teorica']))
+    fig.data[2].update(serie(t, historial['W_sag']))
+
+def crear_figura_leyes():
     fig = go.Figure()
     
-    t = np.array(historial['t'])
+    fig.add_trace(go.Scattergl(
+        name='Ley Chancado', line=dict(color='purple', width=2),
+        hovertemplate='%{y:.2f}%<extra>Ley Chancado</extra>'
+    ))
     
-    if len(t) > 1:
-        if st.session_state.simulador.params['k_descarga'] > 0:
-            masa_teorica = np.array(historial['F_target']) / st.session_state.simulador.params['k_descarga']
-        else:
-            masa_teorica = np.zeros_like(t)
-        
-        fig.add_trace(go.Scatter(
-            x=t, y=historial['M_sag'],
-            name='Masa Real', line=dict(color='blue', width=3),
-            hovertemplate='%{y:.0f} t<extra>Masa Real</extra>'
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=t, y=masa_teorica,
-            name='Masa Teórica', line=dict(color='gray', width=2, dash='dash'),
-            hovertemplate='%{y:.0f} t<extra>Masa Teórica</extra>'
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=t, y=historial['W_sag'],
-            name='Agua', line=dict(color='cyan', width=2),
-            hovertemplate='%{y:.0f} t<extra>Agua</extra>'
-        ))
-    
-    fig.update_layout(
-        height=300,
-        title="Masas en Molino SAG",
-        xaxis_title="Tiempo (horas)",
-        yaxis_title="Masa (toneladas)",
-        showlegend=True,
-        hovermode='x unified',
-        margin=dict(l=20, r=20, t=40, b=20)
-    )
+    fig.add_trace(go.Scattergl(
+        name='Ley SAG', line=dict(color='orange', width=2),
+        hovertemplate='%{y:.2f}%<extra>Ley SAG</extra>'
+    ))
+    
+    fig.add_trace(go.Scattergl(
+        name='Objetivo', line=dict(color='black', width=2, dash='dash'),
+        hovertemplate='%{y:.2f}%<extra>Objetivo Ley</extra>'
+    ))
+    
+    fig.update_layout(**LAYOUT_LEYES)
     
     return fig
 
-def crear_grafico_leyes(historial):
+def actualizar_grafico_leyes(fig, historial):
+    t = historial['t']
+    
+    fig.data[0].update(serie(t, historial['L_chancado_pct']))
+    fig.data[1].update(serie(t, historial['L_sag_pct']))
+    fig.data[2].update(serie(t, historial['L_target_pct']))
+
+def crear_figura_cobre():
     fig = go.Figure()
     
-    t = np.array(historial['t'])
+    fig.add_trace(go.Scattergl(
+        name='Cobre Chancado', line=dict(color='darkblue', width=2),
+        hovertemplate='%{y:.3f} t/h<extra>Cobre Chancado</extra>'
+    ))
     
-    if len(t) > 1:
-        fig.add_trace(go.Scatter(
-            x=t, y=np.array(historial['L_chancado']) * 100,
-            name='Ley Chancado', line=dict(color='purple', width=2),
-            hovertemplate='%{y:.2f}%<extra>Ley Chancado</extra>'
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=t, y=np.array(historial['L_sag']) * 100,
-            name='Ley SAG', line=dict(color='orange', width=2),
-            hovertemplate='%{y:.2f}%<extra>Ley SAG</extra>'
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=t, y=np.array(historial['L_target']) * 100,
-            name='Objetivo', line=dict(color='black', width=2, dash='dash'),
-            hovertemplate='%{y:.2f}%<extra>Objetivo Ley</extra>'
-        ))
-    
-    fig.update_layout(
-        height=300,
-        title="Comparación de Leyes",
-        xaxis_title="Tiempo (horas)",
-        yaxis_title="Ley (%)",
-        showlegend=True,
-        hovermode='x unified',
-        margin=dict(l=20, r=20, t=40, b=20)
-    )
+    fig.add_trace(go.Scattergl(
+        name='Cobre Finos', line=dict(color='darkgreen', width=2),
+        hovertemplate='%{y:.3f} t/h<extra>Cobre Finos</extra>'
+    ))
+    
+    fig.add_trace(go.Scattergl(
+        name='Total', line=dict(color='black', width=1, dash='dot'),
+        hovertemplate='%{y:.3f} t/h<extra>Total Cobre</extra>'
+    ))
+    
+    fig.update_layout(**LAYOUT_COBRE)
     
     return fig
 
-def crear_grafico_cobre(historial):
-    fig = go.Figure()
+def actualizar_grafico_cobre(fig, historial):
+    t = historial['t']
     
-    t = np.array(historial['t'])
+    fig.data[0].update(serie(t, historial['F_cu_chancado']))
+    fig.data[1].update(serie(t, historial['F_cu_finos']))
+    fig.data[2].update(serie(t, historial['F_cu_total']))
+
+# ================= PANELES EN VIVO =================
+# Solo estos fragmentos se re-ejecutan en cada refresco; la barra lateral y
+# los formularios corren únicamente ante una interacción del usuario.
+periodo_refresco = (pasos_por_ciclo() * st.session_state.velocidad_sim
+                    if st.session_state.simulando else None)
+
+def balance_actual(sim):
+    """
+    Flujos de la última muestra y balance de masa del SAG, leídos una sola
+    vez para todos los paneles que los muestran. None antes de la primera
+    muestra.
+    """
+    F_chancado = sim.ultimo('F_chancado')
+    if F_chancado is None:
+        return None
+    
+    F_alimentacion = F_chancado + sim.ultimo('F_sobre_tamano')
+    return {
+        'F_chancado': F_chancado,
+        'F_alimentacion': F_alimentacion,
+        'balance': F_alimentacion - sim.ultimo('F_descarga')
+    }
+
+def resumir_estado(sim):
+    """Textos de las métricas y barra de equilibrio del panel de estado"""
+    estado_actual = sim.obtener_estado()
+    F_finos_actual = sim.ultimo('F_finos') or 0.0
+    
+    resumen = {
+        't': f"{estado_actual['t']:.1f} h",
+        'F_actual': f"{estado_actual['F_actual']:.0f} t/h",
+        'M_sag': f"{estado_actual['M_sag']:.0f} t",
+        'L_actual': f"{estado_actual['L_actual']*100:.2f} %",
+        'H_sag': f"{estado_actual['H_sag']*100:.1f} %",
+        'F_finos': f"{F_finos_actual:.0f} t/h",
+        'equilibrio': None,
+        'texto_balance': None
+    }
     
-    if len(t) > 1:
-        F_cu_chancado = np.array(historial['F_chancado']) * np.array(historial['L_chancado'])
-        F_cu_finos = np.array(historial['F_finos']) * np.array(historial['L_sag'])
-        
-        fig.add_trace(go.Scatter(
-            x=t, y=F_cu_chancado,
-            name='Cobre Chancado', line=dict(color='darkblue', width=2),
-            hovertemplate='%{y:.3f} t/h<extra>Cobre Chancado</extra>'
-        ))
+    # Indicador de equilibrio
+    flujos = balance_actual(sim)
+    if flujos is not None:
+        balance = flujos['balance']
         
-        fig.add_trace(go.Scatter(
-            x=t, y=F_cu_finos,
-            name='Cobre Finos', line=dict(color='darkgreen', width=2),
-            hovertemplate='%{y:.3f} t/h<extra>Cobre Finos</extra>'
-        ))
+        if abs(balance) < 50:
+            color = "🟢"
+            texto = f"{color} Balance: {balance:.0f} t/h (Estable)"
+        elif abs(balance) < 200:
+            color = "🟡"
+            texto = f"{color} Balance: {balance:.0f} t/h (Moderado)"
+        else:
+            color = "🔴"
+            texto = f"{color} Balance: {balance:.0f} t/h (Inestable)"
         
-        fig.add_trace(go.Scatter(
-            x=t, y=F_cu_chancado + F_cu_finos,
-            name='Total', line=dict(color='black', width=1, dash='dot'),
-            hovertemplate='%{y:.3f} t/h<extra>Total Cobre</extra>'
-        ))
-    
-    fig.update_layout(
-        height=300,
-        title="Flujos de Cobre",
-        xaxis_title="Tiempo (horas)",
-        yaxis_title="Flujo Cobre (t/h)",
-        showlegend=True,
-        hovermode='x unified',
-        margin=dict(l=20, r=20, t=40, b=20)
-    )
+        resumen['equilibrio'] = min(abs(balance) / max(flujos['F_chancado'], 1), 1.0)
+        resumen['texto_balance'] = texto
     
-    return fig
+    return resumen
 
-# ================= MOSTRAR GRÁFICOS =================
-historial = st.session_state.simulador.obtener_historial()
+@st.fragment(run_every=periodo_refresco)
+def panel_estado():
+    """Métricas de estado actual de la barra lateral"""
+    st.subheader("📊 **Estado Actual**")
+    
+    # El resumen se recalcula solo si la simulación avanzó desde el último
+    # refresco; si no, se vuelven a emitir los textos ya formateados
+    sim = st.session_state.simulador
+    resumen = st.session_state.get('resumen_estado')
+    if resumen is None or resumen['paso'] != sim.pasos:
+        resumen = resumir_estado(sim)
+        resumen['paso'] = sim.pasos
+        st.session_state.resumen_estado = resumen
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Tiempo simulado", resumen['t'])
+        st.metric("Flujo actual", resumen['F_actual'])
+        st.metric("Masa SAG", resumen['M_sag'])
+    
+    with col2:
+        st.metric("Ley actual", resumen['L_actual'])
+        st.metric("Humedad SAG", resumen['H_sag'])
+        st.metric("Finos actuales", resumen['F_finos'])
+    
+    if resumen['equilibrio'] is not None:
+        st.progress(resumen['equilibrio'], text=resumen['texto_balance'])
 
-col1, col2 = st.columns(2)
-with col1:
-    st.plotly_chart(crear_grafico_balance(historial), use_container_width=True)
-with col2:
-    st.plotly_chart(crear_grafico_masas(historial), use_container_width=True)
+# Solo se actualizan y envían al navegador los gráficos de la vista elegida
+VISTAS_GRAFICOS = {
+    "Sólidos y masas": ('balance', 'masas'),
+    "Leyes y cobre": ('leyes', 'cobre'),
+    "Todos": ('balance', 'masas', 'leyes', 'cobre')
+}
 
-col3, col4 = st.columns(2)
-with col3:
-    st.plotly_chart(crear_grafico_leyes(historial), use_container_width=True)
-with col4:
-    st.plotly_chart(crear_grafico_cobre(historial), use_container_width=True)
+ACTUALIZAR_GRAFICO = {
+    'balance': actualizar_grafico_balance,
+    'masas': actualizar_grafico_masas,
+    'leyes': actualizar_grafico_leyes,
+    'cobre': actualizar_grafico_cobre
+}
 
-# ================= INFORMACIÓN DEL SISTEMA =================
-st.markdown("---")
+if 'figuras' not in st.session_state:
+    st.session_state.figuras = {
+        'balance': crear_figura_balance(),
+        'masas': crear_figura_masas(),
+        'leyes': crear_figura_leyes(),
+        'cobre': crear_figura_cobre()
+    }
 
-with st.expander("📈 **Información del Sistema**"):
+@st.fragment(run_every=periodo_refresco)
+def panel_simulacion():
+    """Avanza la simulación y redibuja gráficos, información y pie de página"""
+    # ========== EJECUTAR PASO ==========
+    if st.session_state.simulando:
+        n_pasos = pasos_por_ciclo()
+        st.session_state.simulador.paso_simulacion(n_pasos)
+        st.session_state.pasos_ejecutados += n_pasos
+    
+    # Estado, balance y textos que comparten la información, el pie y el
+    # mensaje final; se leen y formatean una sola vez por refresco
     estado = st.session_state.simulador.obtener_estado()
-    params = st.session_state.simulador.params
+    flujos = balance_actual(st.session_state.simulador)
+    textos = {
+        't': f"{estado['t']:.1f}",
+        'velocidad': f"{1/st.session_state.velocidad_sim:.1f}"
+    }
     
-    if historial['F_chancado'] and len(historial['F_chancado']) > 0:
-        F_chancado_actual = historial['F_chancado'][-1]
-        F_sobre_actual = historial['F_sobre_tamano'][-1] if historial['F_sobre_tamano'] and len(historial['F_sobre_tamano']) > 0 else 0
-        F_alimentacion = F_chancado_actual + F_sobre_actual
+    # ========== MOSTRAR GRÁFICOS ==========
+    figuras = st.session_state.figuras
+
+    vista = st.radio(
+        "Gráficos",
+        options=list(VISTAS_GRAFICOS.keys()),
+        horizontal=True,
+        key="vista_graficos",
+        label_visibility="collapsed"
+    )
+    visibles = VISTAS_GRAFICOS[vista]
+
+    # Las trazas solo se recalculan si hay muestras nuevas; en los reruns sin
+    # avance (p. ej. aplicar parámetros en pausa) se reusan tal cual
+    clave_graficos = st.session_state.simulador.muestras_registradas
+    claves = st.session_state.setdefault('claves_graficos', {})
+    pendientes = [nombre for nombre in visibles if claves.get(nombre) != clave_graficos]
+    
+    # En marcha se actualiza un solo gráfico por refresco, rotando entre los
+    # visibles; los demás se muestran tal cual. En pausa se ponen todos al día.
+    if pendientes and st.session_state.simulando:
+        inicio = st.session_state.get('turno_grafico', 0) % len(visibles)
+        orden = visibles[inicio:] + visibles[:inicio]
+        elegido = next(nombre for nombre in orden if nombre in pendientes)
+        st.session_state.turno_grafico = visibles.index(elegido) + 1
+        pendientes = [elegido]
+
+    # El historial (vistas sin copia sobre el buffer del simulador) se pide
+    # una sola vez y solo cuando algún gráfico necesita datos nuevos
+    if pendientes:
+        historial = st.session_state.simulador.obtener_historial()
+    
+        for nombre in pendientes:
+            ACTUALIZAR_GRAFICO[nombre](figuras[nombre], historial)
+            claves[nombre] = clave_graficos
+
+    for i in range(0, len(visibles), 2):
+        columnas = st.columns(2)
+        for columna, nombre in zip(columnas, visibles[i:i + 2]):
+            with columna:
+                st.plotly_chart(figuras[nombre], use_container_width=True,
+                                key=f"grafico_{nombre}")
+    
+    # ========== INFORMACIÓN DEL SISTEMA ==========
+    st.markdown("---")
+
+    with st.expander("📈 **Información del Sistema**"):
+        params = st.session_state.simulador.params
+    
+        if flujos is not None:
+            F_alimentacion = flujos['F_alimentacion']
         
-        M_equilibrio = F_alimentacion / params['k_descarga'] if params['k_descarga'] > 0 else 0
-        M_actual = estado['M_sag']
-        diferencia = abs(M_actual - M_equilibrio)
+            M_equilibrio = F_alimentacion / params['k_descarga'] if params['k_descarga'] > 0 else 0
+            M_actual = estado['M_sag']
+            diferencia = abs(M_actual - M_equilibrio)
         
-        # Calcular constantes de tiempo efectivas
-        tau_efectivo_flujo = st.session_state.simulador.tau_F
-        tau_efectivo_masa = 1.0 / params['k_descarga'] if params['k_descarga'] > 0 else float('inf')
+            # Calcular constantes de tiempo efectivas
+            tau_efectivo_flujo = st.session_state.simulador.tau_F
+            tau_efectivo_masa = 1.0 / params['k_descarga'] if params['k_descarga'] > 0 else float('inf')
         
-        st.markdown(f"""
-        ### **Dinámica del Sistema:**
+            st.markdown(f"""
+            ### **Dinámica del Sistema:**
         
-        - **τ flujo:** {tau_efectivo_flujo:.1f} horas (63% del objetivo en este tiempo)
-        - **τ ley:** {st.session_state.simulador.tau_L:.1f} horas
-        - **τ masa SAG:** {tau_efectivo_masa:.1f} horas (1/k)
+            - **τ flujo:** {tau_efectivo_flujo:.1f} horas (63% del objetivo en este tiempo)
+            - **τ ley:** {st.session_state.simulador.tau_L:.1f} horas
+            - **τ masa SAG:** {tau_efectivo_masa:.1f} horas (1/k)
         
-        ### **Comportamiento Esperado:**
+            ### **Comportamiento Esperado:**
         
-        1. **Chancado:** Crece como F(t) = F_obj × [1 - exp(-t/τ_F)]
-        2. **Ley:** Crece como L(t) = L_obj × [1 - exp(-t/τ_L)] + variaciones
-        3. **Masa SAG:** Crece como M(t) = (F_alim/k) × [1 - exp(-k×t)]
-        4. **Desacople total:** τ_F solo afecta flujo, τ_L solo afecta ley
+            1. **Chancado:** Crece como F(t) = F_obj × [1 - exp(-t/τ_F)]
+            2. **Ley:** Crece como L(t) = L_obj × [1 - exp(-t/τ_L)] + variaciones
+            3. **Masa SAG:** Crece como M(t) = (F_alim/k) × [1 - exp(-k×t)]
+            4. **Desacople total:** τ_F solo afecta flujo, τ_L solo afecta ley
         
-        ### **Tiempos característicos:**
+            ### **Tiempos característicos:**
         
-        - **1×τ_F ({tau_efectivo_flujo:.1f}h):** Chancado al 63% del objetivo
-        - **3×τ_F ({tau_efectivo_flujo*3:.1f}h):** Chancado al 95% del objetivo
-        - **1×τ_masa ({tau_efectivo_masa:.1f}h):** Masa al 63% del equilibrio
-        """)
+            - **1×τ_F ({tau_efectivo_flujo:.1f}h):** Chancado al 63% del objetivo
+            - **3×τ_F ({tau_efectivo_flujo*3:.1f}h):** Chancado al 95% del objetivo
+            - **1×τ_masa ({tau_efectivo_masa:.1f}h):** Masa al 63% del equilibrio
+            """)
 
-# ================= PIE DE PÁGINA =================
-st.markdown("---")
+    # ========== PIE DE PÁGINA ==========
+    st.markdown("---")
 
-estado = st.session_state.simulador.obtener_estado()
-historial = st.session_state.simulador.obtener_historial()
+    col1, col2, col3, col4 = st.columns(4)
 
-col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        velocidad_display = f"{textos['velocidad']}x" if st.session_state.simulando else "0x"
+        st.metric("Velocidad simulación", velocidad_display)
 
-with col1:
-    velocidad_display = f"{1/st.session_state.velocidad_sim:.1f}x" if st.session_state.simulando else "0x"
-    st.metric("Velocidad simulación", velocidad_display)
+    with col2:
+        st.metric("Tiempo simulado", f"{textos['t']} h")
 
-with col2:
-    st.metric("Tiempo simulado", f"{estado['t']:.1f} h")
+    with col3:
+        F_finos_actual = st.session_state.simulador.ultimo('F_finos') or 0.0
+        st.metric("Producción finos", f"{F_finos_actual:.0f} t/h")
 
-with col3:
-    if historial['F_finos'] and len(historial['F_finos']) > 0:
-        st.metric("Producción finos", f"{historial['F_finos'][-1]:.0f} t/h")
-    else:
-        st.metric("Producción finos", "0 t/h")
-
-with col4:
-    if historial['F_chancado'] and len(historial['F_chancado']) > 0:
-        F_chancado_actual = historial['F_chancado'][-1]
-        F_sobre_actual = historial['F_sobre_tamano'][-1] if historial['F_sobre_tamano'] and len(historial['F_sobre_tamano']) > 0 else 0
-        F_descarga_actual = historial['F_descarga'][-1] if historial['F_descarga'] and len(historial['F_descarga']) > 0 else 0
-        balance = F_chancado_actual + F_sobre_actual - F_descarga_actual
-        
-        if abs(balance) < 50:
-            estado_balance = "⚖️ Estable"
-        elif balance > 0:
-            estado_balance = "📈 Subiendo"
+    with col4:
+        if flujos is not None:
+            balance = flujos['balance']
+        
+            if abs(balance) < 50:
+                estado_balance = "⚖️ Estable"
+            elif balance > 0:
+                estado_balance = "📈 Subiendo"
+            else:
+                estado_balance = "📉 Bajando"
+        
+            st.metric("Balance masa", f"{balance:.0f} t/h", estado_balance)
         else:
-            estado_balance = "📉 Bajando"
-        
-        st.metric("Balance masa", f"{balance:.0f} t/h", estado_balance)
-    else:
-        st.metric("Balance masa", "0 t/h", "⏳ Inicial")
+            st.metric("Balance masa", "0 t/h", "⏳ Inicial")
 
-# Mensaje final
-st.markdown("---")
+    # Mensaje final
+    st.markdown("---")
 
-if not st.session_state.simulando:
-    st.info("""
-    ⏸️ **Simulación en pausa** 
+    if not st.session_state.simulando:
+        st.info("""
+        ⏸️ **Simulación en pausa** 
     
-    Haz clic en **▶️ INICIAR** para comenzar la simulación.
-    Observa el crecimiento exponencial del chancado desde 0 t/h.
-    """)
-else:
-    st.success(f"""
-    🔄 **Simulación en curso** 
+        Haz clic en **▶️ INICIAR** para comenzar la simulación.
+        Observa el crecimiento exponencial del chancado desde 0 t/h.
+        """)
+    else:
+        st.success(f"""
+        🔄 **Simulación en curso** 
     
-    - Pasos ejecutados: **{st.session_state.pasos_ejecutados}**
-    - Tiempo simulado: **{estado['t']:.1f} horas**
-    - Velocidad: **{1/st.session_state.velocidad_sim:.1f} pasos/segundo**
+        - Pasos ejecutados: **{st.session_state.pasos_ejecutados}**
+        - Tiempo simulado: **{textos['t']} horas**
+        - Velocidad: **{textos['velocidad']} pasos/segundo**
     
-    **Comportamiento esperado:**
-    - Chancado: {estado['F_actual']:.0f} t/h → objetivo: {st.session_state.simulador.objetivos['F_target']:.0f} t/h
-    - Ley: {estado['L_actual']*100:.2f}% → objetivo: {st.session_state.simulador.objetivos['L_target']*100:.2f}%
-    - Masa equilibrio: ≈ {st.session_state.simulador.objetivos['F_target'] / st.session_state.simulador.params['k_descarga']:.0f} t
-    """)
+        **Comportamiento esperado:**
+        - Chancado: {estado['F_actual']:.0f} t/h → objetivo: {st.session_state.simulador.objetivos['F_target']:.0f} t/h
+        - Ley: {estado['L_actual']*100:.2f}% → objetivo: {st.session_state.simulador.objetivos['L_target']*100:.2f}%
+        - Masa equilibrio: ≈ {st.session_state.simulador.objetivos['F_target'] / st.session_state.simulador.params['k_descarga']:.0f} t
+        """)
+
+panel_simulacion()
+
+with st.sidebar:
+    panel_estado()
 
 st.caption("""
 💡 **Notas:** 
@@ -538,9 +714,3 @@ st.caption("""
 - τ_F y τ_L son completamente independientes
 - La masa SAG tiene su propia constante de tiempo = 1/k
 """)
-
-# ================= AUTO-REFRESH =================
-if st.session_state.simulando:
-    time.sleep(st.session_state.velocidad_sim)
-    st.rerun()
-
@@ -4,7 +4,308 @@ Chancado con crecimiento exponencial correcto y desacoplamiento total
 """
 
 import numpy as np
-from collections import deque
+from numba import njit
+
+# ================= VECTOR DE ESTADO =================
+# El estado del sistema vive en un arreglo float64 de tamaño fijo para que
+# los kernels compilados con Numba trabajen sin diccionarios.
+IDX_T = 0          # Tiempo actual (horas)
+IDX_M_SAG = 1      # Masa de sólidos en SAG (ton)
+IDX_W_SAG = 2      # Masa de agua en SAG (ton)
+IDX_M_CU_SAG = 3   # Masa de cobre en SAG (ton)
+IDX_F_ACTUAL = 4   # Flujo actual chancado (t/h)
+IDX_L_ACTUAL = 5   # Ley actual
+IDX_H_SAG = 6      # Humedad actual
+N_ESTADO = 7
+
+CLAVES_ESTADO = ('t', 'M_sag', 'W_sag', 'M_cu_sag', 'F_actual', 'L_actual', 'H_sag')
+
+# ================= HISTORIAL =================
+# Todas las series comparten un bloque 2D preasignado (una fila contigua
+# por canal, en el orden de CLAVES_HISTORIAL) que funciona como buffer
+# circular: al llenarse se sobrescriben las muestras más antiguas. Cada
+# muestra se escribe dos veces (en i y en i + MAX_PUNTOS_HISTORIAL), así la
+# ventana cronológica siempre es un tramo contiguo que se entrega sin copia.
+CLAVES_HISTORIAL = (
+    't', 'M_sag', 'W_sag', 'M_cu_sag',
+    'F_chancado', 'L_chancado', 'F_finos',
+    'F_sobre_tamano', 'F_target', 'L_target',
+    'F_descarga', 'L_sag', 'H_sag',
+    'M_teorica', 'F_cu_chancado', 'F_cu_finos', 'F_cu_total',
+    'L_chancado_pct', 'L_sag_pct', 'L_target_pct'
+)
+MAX_PUNTOS_HISTORIAL = 24 * 60
+PASOS_POR_MUESTRA = 6   # Se registra una muestra cada 6 pasos (6 minutos)
+
+# ================= RETARDO DE RECIRCULACIÓN =================
+# El flujo de chancado de cada paso se guarda en un buffer circular indexado
+# por número de paso; el retardo se lee con un solo acceso por índice.
+MAX_PASOS_RETARDO = 24 * 60   # Retardo máximo representable (1 día)
+
+# ================= PASO DE INTEGRACIÓN =================
+# Constante de módulo: Numba la congela como literal al compilar los
+# kernels, de modo que las multiplicaciones por dt se pliegan en tiempo
+# de compilación.
+DT = 1.0 / 60.0   # 1 minuto en horas
+
+
+# ================= VARIABILIDAD NATURAL =================
+# Las ondas de variación dependen solo del número de paso, así que se
+# tabulan por bloques de un día simulado en lugar de evaluar seis senos
+# en cada paso.
+BLOQUE_VARIACION = 24 * 60
+
+
+def tabla_variacion(paso_inicial, n_pasos, dt):
+    """
+    Ondas de variación de flujo (fila 0) y de ley sin ruido (fila 1)
+    para n_pasos pasos consecutivos desde paso_inicial
+    """
+    t = (paso_inicial + np.arange(n_pasos)) * dt
+    
+    tabla = np.empty((2, n_pasos))
+    tabla[0] = (0.4 * np.sin(0.15 * t) +
+                0.3 * np.sin(0.35 * t + 1.0) +
+                0.3 * np.sin(0.8 * t + 2.0))
+    tabla[1] = (0.4 * np.sin(0.2 * t + 0.5) +
+                0.3 * np.sin(0.5 * t + 1.2) +
+                0.3 * np.sin(0.9 * t + 2.5))
+    
+    return tabla
+
+
+# ================= KERNELS NUMÉRICOS =================
+@njit(cache=True, fastmath=True)
+def _kernel_chancado(estado, F_target, L_target, ganancia_F, ganancia_L,
+                     amplitud_F, amplitud_L, tabla, k, ruido_L):
+    """
+    Dinámica de primer orden del chancado (flujo y ley desacoplados).
+    ganancia_F y ganancia_L son dt/τ, precalculadas al cambiar τ.
+    Las ondas de variación se leen de la columna k de la tabla.
+    Actualiza F_actual y L_actual en el vector de estado.
+    """
+    t = estado[IDX_T]
+    
+    # ========== FLUJO DE CHANCADO ==========
+    F_actual = estado[IDX_F_ACTUAL]
+    F_base = F_actual + (F_target - F_actual) * ganancia_F
+    
+    if amplitud_F > 0 and t > 2.0:
+        F_chancado = F_base * (1 + amplitud_F * tabla[0, k])
+    else:
+        F_chancado = F_base
+    
+    F_chancado = min(max(F_chancado, 0.0), 5000.0)
+    
+    # ========== LEY DE CHANCADO ==========
+    L_actual = estado[IDX_L_ACTUAL]
+    L_base = L_actual + (L_target - L_actual) * ganancia_L
+    
+    if t > 1.0:
+        variacion_L = tabla[1, k] + ruido_L
+        L_variada = L_base * (1 + amplitud_L * variacion_L)
+    else:
+        L_variada = L_base
+    
+    L_chancado = min(max(L_variada, 0.0), 0.02)
+    
+    estado[IDX_F_ACTUAL] = F_chancado
+    estado[IDX_L_ACTUAL] = L_chancado
+    
+    return F_chancado, L_chancado
+
+
+@njit(cache=True, fastmath=True)
+def _kernel_balance(estado, F_chancado, L_chancado, F_sobre_tamano,
+                    k_descarga, decaimiento, ganancia,
+                    humedad_alimentacion, humedad_sag,
+                    humedad_recirculacion, tau_finos_horas):
+    """
+    Balances de sólidos, agua y cobre del SAG e integración de un paso.
+    decaimiento y ganancia son los coeficientes de la integración exacta,
+    precalculados desde k_descarga por quien llama.
+    Actualiza masas y humedad en el vector de estado; el tiempo lo fija
+    quien lleva la cuenta de pasos.
+    """
+    # ===== ALIMENTACIÓN TOTAL =====
+    F_alimentacion_total = F_chancado + F_sobre_tamano
+    
+    # ===== ESTADO ACTUAL SAG =====
+    M_sag = estado[IDX_M_SAG]
+    W_sag = estado[IDX_W_SAG]
+    M_cu_sag = estado[IDX_M_CU_SAG]
+    
+    if M_sag > 0.001:
+        L_sag = M_cu_sag / M_sag
+        H_sag = W_sag / (M_sag + W_sag)
+    else:
+        L_sag = L_chancado
+        H_sag = humedad_sag
+    
+    # ===== BALANCE DE AGUA =====
+    W_chancado = F_chancado * (humedad_alimentacion / (1 - humedad_alimentacion))
+    W_recirculacion = F_sobre_tamano * (humedad_recirculacion /
+                                        (1 - humedad_recirculacion))
+    
+    if F_alimentacion_total > 0:
+        L_alimentacion_total = (L_chancado * F_chancado +
+                                L_sag * F_sobre_tamano) / F_alimentacion_total
+    else:
+        L_alimentacion_total = L_chancado
+    
+    agua_necesaria = F_alimentacion_total * (humedad_sag / (1 - humedad_sag))
+    agua_disponible = W_chancado + W_recirculacion
+    W_adicional = max(0.0, agua_necesaria - agua_disponible)
+    
+    # ===== DESCARGA SAG =====
+    F_descarga = k_descarga * M_sag
+    
+    # ===== FINOS =====
+    if estado[IDX_T] < tau_finos_horas:
+        F_finos = 0.0
+    else:
+        F_finos = max(0.0, F_descarga - F_sobre_tamano)
+    
+    # ===== ENTRADAS AL SAG =====
+    entrada_M = F_alimentacion_total
+    entrada_W = W_chancado + W_recirculacion + W_adicional
+    entrada_Cu = L_alimentacion_total * F_alimentacion_total
+    
+    # ===== INTEGRACIÓN =====
+    # Con F_descarga = k·M, el agua descargada es F_descarga·H/(1-H) = k·W
+    # y el cobre L_sag·F_descarga = k·M_cu: las tres masas siguen
+    # dX/dt = entrada - k·X. Con entradas constantes durante el paso la
+    # solución exacta es X·e^(-k·dt) + entrada/k·(1 - e^(-k·dt)), estable
+    # para cualquier k·dt a diferencia de Euler explícito.
+    estado[IDX_M_SAG] = max(10.0, M_sag * decaimiento + entrada_M * ganancia)
+    estado[IDX_W_SAG] = max(1.0, W_sag * decaimiento + entrada_W * ganancia)
+    estado[IDX_M_CU_SAG] = max(0.0, M_cu_sag * decaimiento + entrada_Cu * ganancia)
+    
+    estado[IDX_H_SAG] = H_sag
+    
+    return F_alimentacion_total, F_finos, F_descarga, L_sag, H_sag
+
+
+@njit(cache=True)
+def _kernel_recirculacion(retardo_F, paso, F_chancado, retardo, fraccion):
+    """
+    Guarda el flujo de chancado del paso en la línea de retardo y retorna
+    la recirculación: la fracción del flujo de hace `retardo` pasos.
+    """
+    retardo_F[paso % MAX_PASOS_RETARDO] = F_chancado
+    
+    # Antes de cumplirse el retardo aún no hay material recirculando
+    if paso <= retardo:
+        return 0.0
+    
+    return fraccion * retardo_F[(paso - retardo) % MAX_PASOS_RETARDO]
+
+
+@njit(cache=True, fastmath=True)
+def _kernel_pasos(estado, n, paso, F_target, L_target, ganancia_F, ganancia_L,
+                  amplitud_F, amplitud_L, tabla, ruido_ley, k,
+                  retardo_F, retardo, fraccion,
+                  k_descarga, decaimiento, ganancia,
+                  humedad_alimentacion, humedad_sag,
+                  humedad_recirculacion, tau_finos_horas,
+                  M_teorica, historial, hist_idx):
+    """
+    Ejecuta n pasos completos (chancado, recirculación, balances e
+    historial) sin volver a Python. La tabla de variación y el ruido se
+    leen desde la columna k y deben cubrir los n pasos.
+    Retorna las salidas del último paso, la próxima posición de escritura
+    del historial y el número de muestras registradas.
+    """
+    F_chancado = L_chancado = F_sobre_tamano = 0.0
+    F_alimentacion_total = F_finos = F_descarga = L_sag = H_sag = 0.0
+    muestras = 0
+    
+    for j in range(n):
+        # ===== PASO 1: CHANCADO =====
+        F_chancado, L_chancado = _kernel_chancado(
+            estado, F_target, L_target, ganancia_F, ganancia_L,
+            amplitud_F, amplitud_L, tabla, k + j, ruido_ley[k + j]
+        )
+        
+        # ===== PASO 2: RECIRCULACIÓN =====
+        F_sobre_tamano = _kernel_recirculacion(retardo_F, paso + j, F_chancado,
+                                               retardo, fraccion)
+        
+        # ===== PASOS 3-11: BALANCES E INTEGRACIÓN =====
+        F_alimentacion_total, F_finos, F_descarga, L_sag, H_sag = _kernel_balance(
+            estado, F_chancado, L_chancado, F_sobre_tamano,
+            k_descarga, decaimiento, ganancia,
+            humedad_alimentacion, humedad_sag,
+            humedad_recirculacion, tau_finos_horas
+        )
+        
+        # ===== ACTUALIZAR TIEMPO =====
+        # Derivado del contador entero: no acumula error de redondeo
+        estado[IDX_T] = (paso + j + 1) * DT
+        
+        # ===== PASO 12: GUARDAR HISTORIAL =====
+        if (paso + j + 1) % PASOS_POR_MUESTRA == 0:
+            i = hist_idx
+            
+            # Una columna en el orden de CLAVES_HISTORIAL, con los canales
+            # derivados que usan los gráficos
+            F_cu_chancado = F_chancado * L_chancado
+            F_cu_finos = F_finos * L_sag
+            historial[0, i] = estado[IDX_T]
+            historial[1, i] = estado[IDX_M_SAG]
+            historial[2, i] = estado[IDX_W_SAG]
+            historial[3, i] = estado[IDX_M_CU_SAG]
+            historial[4, i] = F_chancado
+            historial[5, i] = L_chancado
+            historial[6, i] = F_finos
+            historial[7, i] = F_sobre_tamano
+            historial[8, i] = F_target
+            historial[9, i] = L_target
+            historial[10, i] = F_descarga
+            historial[11, i] = L_sag
+            historial[12, i] = H_sag
+            historial[13, i] = M_teorica
+            historial[14, i] = F_cu_chancado
+            historial[15, i] = F_cu_finos
+            historial[16, i] = F_cu_chancado + F_cu_finos
+            historial[17, i] = L_chancado * 100.0
+            historial[18, i] = L_sag * 100.0
+            historial[19, i] = L_target * 100.0
+            historial[:, i + MAX_PUNTOS_HISTORIAL] = historial[:, i]
+            
+            hist_idx = (i + 1) % MAX_PUNTOS_HISTORIAL
+            muestras += 1
+    
+    return (F_chancado, L_chancado, F_sobre_tamano, F_alimentacion_total,
+            F_finos, F_descarga, L_sag, H_sag, hist_idx, muestras)
+
+
+def coeficientes_descarga(k_descarga):
+    """
+    Coeficientes (e^(-k·dt), (1 - e^(-k·dt))/k) de la integración exacta
+    de las masas del SAG; con k = 0 se reducen a (1, dt)
+    """
+    if k_descarga > 0:
+        decaimiento = float(np.exp(-k_descarga * DT))
+        return decaimiento, (1.0 - decaimiento) / k_descarga
+    return 1.0, DT
+
+
+def precompilar_kernels():
+    """
+    Fuerza la compilación (o la carga desde la caché en disco) de los
+    kernels para no pagar el JIT en el primer paso de la simulación
+    """
+    estado = np.zeros(N_ESTADO)
+    estado[IDX_M_SAG] = 100.0
+    tabla = tabla_variacion(0, PASOS_POR_MUESTRA, DT)
+    historial = np.empty((len(CLAVES_HISTORIAL), 2 * MAX_PUNTOS_HISTORIAL))
+    _kernel_pasos(estado, PASOS_POR_MUESTRA, 0, 2000.0, 0.0072, DT / 0.5, DT,
+                  0.0, 0.01, tabla, np.zeros(PASOS_POR_MUESTRA), 0,
+                  np.zeros(MAX_PASOS_RETARDO), 90, 0.11,
+                  0.5, *coeficientes_descarga(0.5),
+                  0.035, 0.30, 0.08, 0.8, 4000.0, historial, 0)
+
 
 class SimuladorSAG:
     """
@@ -18,7 +319,7 @@ class SimuladorSAG:
         self.params = params.copy()
         
         # Estado inicial del sistema - CORREGIDO
-        self.estado = {
+        estado_inicial = {
             't': 0.0,                         # Tiempo actual (horas)
             'M_sag': 100.0,                   # Masa de sólidos en SAG (ton)
             'W_sag': 42.86,                   # Masa de agua en SAG (ton)
@@ -42,228 +343,136 @@ class SimuladorSAG:
         self.amplitud_variacion_ley = 0.01    # ±1% de variación
         self.amplitud_variacion_flujo = 0.0   # Sin variación por defecto
         
-        # Buffers para retardos
-        self.buffer_F = deque(maxlen=10000)
-        self.buffer_t = deque(maxlen=10000)
+        # Vector de estado que consumen los kernels compilados; es la única
+        # copia del estado (el diccionario `estado` se arma al leerlo)
+        self._estado = np.array([estado_inicial[c] for c in CLAVES_ESTADO],
+                                dtype=np.float64)
         
-        # Inicializar buffers
-        self.buffer_F.append(self.estado['F_actual'])
-        self.buffer_t.append(self.estado['t'])
+        # Línea de retardo de la recirculación (F_chancado por paso)
+        self._retardo_F = np.zeros(MAX_PASOS_RETARDO)
         
-        # Historial para gráficos
-        self.historial = {
-            't': [], 'M_sag': [], 'W_sag': [], 'M_cu_sag': [],
-            'F_chancado': [], 'L_chancado': [], 'F_finos': [],
-            'F_sobre_tamano': [], 'F_target': [], 'L_target': [],
-            'F_descarga': [], 'L_sag': [], 'H_sag': []
-        }
+        # Historial para gráficos (buffer circular canal x muestra, de doble
+        # largo); el diccionario interno da acceso a cada fila por nombre.
+        # Las filas incluyen posiciones sin escribir y la mitad espejo: hacia
+        # afuera solo se entregan las muestras válidas (obtener_historial)
+        self._historial = np.empty((len(CLAVES_HISTORIAL), 2 * MAX_PUNTOS_HISTORIAL))
+        self._filas_historial = dict(zip(CLAVES_HISTORIAL, self._historial))
+        self._hist_idx = 0   # Próxima posición de escritura
+        self._hist_len = 0   # Muestras válidas en los buffers
+        self.muestras_registradas = 0   # Total histórico (versión del historial)
         
         # Control de simulación
-        self.dt = 1/60.0  # 1 minuto en horas
-        self.semilla_aleatoria = np.random.randint(1, 10000)
-        np.random.seed(self.semilla_aleatoria)
-    
-    def calcular_alimentacion_chancado(self, dt):
-        """
-        Calcula el flujo y ley de CHANCADO con dinámica correcta
-        
-        CAMBIOS CLAVE:
-        1. Dinámica de primer orden pura SIN límites artificiales
-        2. τ_F y τ_L completamente independientes
-        3. Crecimiento exponencial correcto
-        """
-        
-        t = self.estado['t']
-        
-        # ========== FLUJO DE CHANCADO ==========
-        # Dinámica: dF/dt = (F_target - F) / τ_F
-        
-        F_target = self.objetivos['F_target']
-        F_actual = self.estado['F_actual']
-        
-        # CAMBIO CRÍTICO: Sin límites artificiales
-        cambio_F = (F_target - F_actual) / self.tau_F * dt
-        F_base = F_actual + cambio_F
-        
-        # Variaciones (opcionales)
-        if self.amplitud_variacion_flujo > 0 and t > 2.0:
-            onda_F1 = 0.4 * np.sin(0.15 * t)
-            onda_F2 = 0.3 * np.sin(0.35 * t + 1.0)
-            onda_F3 = 0.3 * np.sin(0.8 * t + 2.0)
-            variacion_F = (onda_F1 + onda_F2 + onda_F3) / 1.0
-            F_chancado = F_base * (1 + self.amplitud_variacion_flujo * variacion_F)
-        else:
-            F_chancado = F_base
-        
-        # Solo límites físicos absolutos
-        F_chancado = np.clip(F_chancado, 0.0, 5000.0)
-        
-        # ========== LEY DE CHANCADO ==========
-        # Dinámica: dL/dt = (L_target - L) / τ_L
-        # COMPLETAMENTE INDEPENDIENTE del flujo
+        self.dt = DT      # 1 minuto en horas (fijo en los kernels)
+        self._paso = 0    # Pasos ejecutados (contador entero, sin deriva)
         
-        L_target = self.objetivos['L_target']
-        L_actual = self.estado['L_actual']
-        
-        # CAMBIO CRÍTICO: Sin límites artificiales
-        cambio_L = (L_target - L_actual) / self.tau_L * dt
-        L_base = L_actual + cambio_L
-        
-        # Variaciones senoidales en ley
-        if t > 1.0:
-            onda_L1 = 0.4 * np.sin(0.2 * t + 0.5)
-            onda_L2 = 0.3 * np.sin(0.5 * t + 1.2)
-            onda_L3 = 0.3 * np.sin(0.9 * t + 2.5)
-            ruido_L = np.random.normal(0, 0.02)
-            variacion_L = (onda_L1 + onda_L2 + onda_L3) / 1.0 + ruido_L
-            L_variada = L_base * (1 + self.amplitud_variacion_ley * variacion_L)
-        else:
-            L_variada = L_base
-        
-        # Solo límites físicos amplios
-        L_chancado = np.clip(L_variada, 0.0, 0.02)
-        
-        # Actualizar estado
-        self.estado['F_actual'] = F_chancado
-        self.estado['L_actual'] = L_chancado
+        # Generador propio de la instancia: no toca el estado global de
+        # NumPy, que comparten todas las sesiones del servidor
+        self.semilla_aleatoria = np.random.randint(1, 10000)
+        self._rng = np.random.default_rng(self.semilla_aleatoria)
         
-        return F_chancado, L_chancado
+        # Tabla de variación y ruido de ley vigentes, y paso en que comienzan
+        self._inicio_tabla = 0
+        self._tabla_variacion = tabla_variacion(0, BLOQUE_VARIACION, self.dt)
+        self._ruido_ley = self._rng.normal(0, 0.02, BLOQUE_VARIACION)
     
-    # ... (resto de funciones igual que antes, manteniendo calcular_recirculacion,
-    # calcular_finos, paso_simulacion, etc.)
+    @property
+    def pasos(self):
+        """Pasos de simulación ejecutados desde el inicio"""
+        return self._paso
     
-    def calcular_recirculacion(self, F_chancado_actual):
-        """
-        Calcula la recirculación con retardo de tiempo
-        """
-        # Agregar valor actual al buffer
-        self.buffer_F.append(F_chancado_actual)
-        self.buffer_t.append(self.estado['t'])
-        
-        tau_rec_horas = self.params['tau_recirculacion'] / 60.0
-        tiempo_pasado = self.estado['t'] - tau_rec_horas
-        
-        if self.estado['t'] < tau_rec_horas:
-            return 0.0
-        
-        if len(self.buffer_t) > 0 and tiempo_pasado >= 0:
-            diferencias = [abs(t - tiempo_pasado) for t in self.buffer_t]
-            idx_min = diferencias.index(min(diferencias))
-            
-            if idx_min < len(self.buffer_F):
-                F_pasado = list(self.buffer_F)[idx_min]
-                return self.params['fraccion_recirculacion'] * F_pasado
-        
-        return 0.0
+    @property
+    def estado(self):
+        """Estado actual como diccionario por nombre, armado desde el vector"""
+        return dict(zip(CLAVES_ESTADO, self._estado.tolist()))
     
-    def calcular_finos(self, F_descarga, F_sobre_tamano):
-        """
-        Calcula producción de finos con retardo
-        """
-        tau_finos_horas = self.params['tau_finos'] / 60.0
-        
-        if self.estado['t'] < tau_finos_horas:
-            return 0.0
-        
-        F_finos = F_descarga - F_sobre_tamano
-        return max(0.0, F_finos)
+    # Las constantes de tiempo se exponen como propiedades para recalcular
+    # la ganancia dt/τ solo cuando cambian, no en cada paso
+    @property
+    def tau_F(self):
+        """Constante de tiempo del flujo de chancado (horas)"""
+        return self._tau_F
+    
+    @tau_F.setter
+    def tau_F(self, valor):
+        self._tau_F = valor
+        self._ganancia_F = DT / valor
+    
+    @property
+    def tau_L(self):
+        """Constante de tiempo de la ley de chancado (horas)"""
+        return self._tau_L
+    
+    @tau_L.setter
+    def tau_L(self, valor):
+        self._tau_L = valor
+        self._ganancia_L = DT / valor
     
-    def paso_simulacion(self):
+    def paso_simulacion(self, n=1):
         """
-        Ejecuta UN PASO de simulación
+        Ejecuta n pasos de simulación (uno por defecto) y retorna las
+        salidas del último
         """
-        # ===== PASO 1: CHANCADO =====
-        F_chancado, L_chancado = self.calcular_alimentacion_chancado(self.dt)
-        
-        # ===== PASO 2: RECIRCULACIÓN =====
-        F_sobre_tamano = self.calcular_recirculacion(F_chancado)
-        
-        # ===== PASO 3: ALIMENTACIÓN TOTAL =====
-        F_alimentacion_total = F_chancado + F_sobre_tamano
-        
-        # ===== PASO 4: ESTADO ACTUAL SAG =====
-        M_sag = self.estado['M_sag']
-        W_sag = self.estado['W_sag']
-        M_cu_sag = self.estado['M_cu_sag']
-        
-        if M_sag > 0.001:
-            L_sag = M_cu_sag / M_sag
-            H_sag = W_sag / (M_sag + W_sag)
-        else:
-            L_sag = L_chancado
-            H_sag = self.params['humedad_sag']
-        
-        # ===== PASO 5: BALANCE DE AGUA =====
-        W_chancado = F_chancado * (self.params['humedad_alimentacion'] / 
-                                   (1 - self.params['humedad_alimentacion']))
-        W_recirculacion = F_sobre_tamano * (self.params['humedad_recirculacion'] / 
-                                           (1 - self.params['humedad_recirculacion']))
-        
-        if F_alimentacion_total > 0:
-            L_alimentacion_total = (L_chancado * F_chancado + 
-                                   L_sag * F_sobre_tamano) / F_alimentacion_total
-        else:
-            L_alimentacion_total = L_chancado
-        
-        agua_necesaria = F_alimentacion_total * (self.params['humedad_sag'] / 
-                                                (1 - self.params['humedad_sag']))
-        agua_disponible = W_chancado + W_recirculacion
-        W_adicional = max(0, agua_necesaria - agua_disponible)
-        
-        # ===== PASO 6: DESCARGA SAG =====
-        F_descarga = self.params['k_descarga'] * M_sag
-        
-        # ===== PASO 7: FINOS =====
-        F_finos = self.calcular_finos(F_descarga, F_sobre_tamano)
-        
-        # ===== PASO 8: AGUA EN DESCARGA =====
-        W_descarga = F_descarga * (H_sag / (1 - H_sag)) if H_sag < 1.0 else 0
-        
-        # ===== PASO 9: ECUACIONES DIFERENCIALES =====
-        dM_dt = F_alimentacion_total - F_descarga
-        dW_dt = W_chancado + W_recirculacion + W_adicional - W_descarga
-        dMcu_dt = L_alimentacion_total * F_alimentacion_total - L_sag * F_descarga
-        
-        # ===== PASO 10: INTEGRACIÓN =====
-        self.estado['M_sag'] += dM_dt * self.dt
-        self.estado['W_sag'] += dW_dt * self.dt
-        self.estado['M_cu_sag'] += dMcu_dt * self.dt
-        
-        self.estado['M_sag'] = max(10.0, self.estado['M_sag'])
-        self.estado['W_sag'] = max(1.0, self.estado['W_sag'])
-        self.estado['M_cu_sag'] = max(0.0, self.estado['M_cu_sag'])
-        
-        # ===== PASO 11: ACTUALIZAR TIEMPO =====
-        self.estado['t'] += self.dt
-        self.estado['H_sag'] = H_sag
-        
-        # ===== PASO 12: GUARDAR HISTORIAL =====
-        if int(self.estado['t'] / self.dt) % 6 == 0:
-            max_puntos = 24 * 60
+        if n < 1:
+            raise ValueError(f"paso_simulacion requiere n >= 1 (se recibió {n})")
+        
+        # Parámetros y objetivos no cambian durante la llamada: se leen una
+        # sola vez en lugar de en cada paso
+        params = self.params
+        argumentos_balance = (
+            params['k_descarga'],
+            *coeficientes_descarga(params['k_descarga']),
+            params['humedad_alimentacion'],
+            params['humedad_sag'],
+            params['humedad_recirculacion'],
+            params['tau_finos'] / 60.0
+        )
+        F_target = self.objetivos['F_target']
+        L_target = self.objetivos['L_target']
+        k_descarga = params['k_descarga']
+        M_teorica = F_target / k_descarga if k_descarga > 0 else 0.0
+        
+        # Retardo de la recirculación en pasos (el más cercano a τ)
+        tau_rec_horas = params['tau_recirculacion'] / 60.0
+        retardo = min(round(tau_rec_horas / DT), MAX_PASOS_RETARDO - 1)
+        
+        # Los pasos corren dentro del kernel en tramos que no cruzan el fin
+        # de la tabla de variación; entre tramos se sortea la siguiente
+        restantes = n
+        while restantes > 0:
+            k = self._paso - self._inicio_tabla
+            if k >= BLOQUE_VARIACION:
+                # El ruido se sortea con el generador de la instancia, un
+                # bloque entero junto con cada tabla de variación
+                self._inicio_tabla = self._paso
+                self._tabla_variacion = tabla_variacion(self._paso, BLOQUE_VARIACION, DT)
+                self._ruido_ley = self._rng.normal(0, 0.02, BLOQUE_VARIACION)
+                k = 0
+            
+            m = min(restantes, BLOQUE_VARIACION - k)
+            (F_chancado, L_chancado, F_sobre_tamano, F_alimentacion_total,
+             F_finos, F_descarga, L_sag, H_sag,
+             self._hist_idx, muestras) = _kernel_pasos(
+                self._estado, m, self._paso, F_target, L_target,
+                self._ganancia_F, self._ganancia_L,
+                self.amplitud_variacion_flujo, self.amplitud_variacion_ley,
+                self._tabla_variacion, self._ruido_ley, k,
+                self._retardo_F, retardo, params['fraccion_recirculacion'],
+                *argumentos_balance,
+                M_teorica, self._historial, self._hist_idx
+            )
             
-            self.historial['t'].append(self.estado['t'])
-            self.historial['M_sag'].append(self.estado['M_sag'])
-            self.historial['W_sag'].append(self.estado['W_sag'])
-            self.historial['M_cu_sag'].append(self.estado['M_cu_sag'])
-            self.historial['F_chancado'].append(F_chancado)
-            self.historial['L_chancado'].append(L_chancado)
-            self.historial['F_finos'].append(F_finos)
-            self.historial['F_sobre_tamano'].append(F_sobre_tamano)
-            self.historial['F_descarga'].append(F_descarga)
-            self.historial['L_sag'].append(L_sag)
-            self.historial['H_sag'].append(H_sag)
-            self.historial['F_target'].append(self.objetivos['F_target'])
-            self.historial['L_target'].append(self.objetivos['L_target'])
+            self._paso += m
+            restantes -= m
+            self._hist_len = min(self._hist_len + muestras, MAX_PUNTOS_HISTORIAL)
+            self.muestras_registradas += muestras
             
-            for key in self.historial:
-                if len(self.historial[key]) > max_puntos:
-                    self.historial[key] = self.historial[key][-max_puntos:]
+        estado = self.estado
         
         return {
-            'tiempo': self.estado['t'],
-            'M_sag': self.estado['M_sag'],
-            'W_sag': self.estado['W_sag'],
-            'M_cu_sag': self.estado['M_cu_sag'],
+            'tiempo': estado['t'],
+            'M_sag': estado['M_sag'],
+            'W_sag': estado['W_sag'],
+            'M_cu_sag': estado['M_cu_sag'],
             'F_chancado': F_chancado,
             'L_chancado': L_chancado,
             'F_finos': F_finos,
@@ -288,11 +497,30 @@ class SimuladorSAG:
     
     def obtener_estado(self):
         """Retorna estado actual"""
-        return self.estado.copy()
+        return self.estado
+    
+    def ultimo(self, clave):
+        """Última muestra de una serie del historial, o None si aún no hay"""
+        if self._hist_len == 0:
+            return None
+        return float(self._filas_historial[clave][self._hist_idx - 1])
     
     def obtener_historial(self):
-        """Retorna historial completo"""
-        return {k: v.copy() for k, v in self.historial.items()}
+        """
+        Retorna historial completo en orden cronológico, como vistas
+        float64 de solo lectura (sin copia) listas para graficar.
+        Son válidas hasta el siguiente paso de simulación.
+        """
+        n, i = self._hist_len, self._hist_idx
+        if n < MAX_PUNTOS_HISTORIAL:
+            bloque = self._historial[:, :n]
+        else:
+            bloque = self._historial[:, i:i + MAX_PUNTOS_HISTORIAL]
+        
+        # Las vistas apuntan al buffer interno: se protegen de escritura
+        bloque.flags.writeable = False
+        
+        return dict(zip(CLAVES_HISTORIAL, bloque))
 
 
 def crear_parametros_default():
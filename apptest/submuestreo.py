@@ -0,0 +1,68 @@
+"""
+SUBMUESTREO DE SERIES PARA GRÁFICOS
+Largest-Triangle-Three-Buckets (LTTB) compilado con Numba
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def indices_lttb(x, y, n_salida):
+    """
+    Índices de los puntos que conserva LTTB para dibujar (x, y) con
+    n_salida puntos. Si la serie ya es más corta se conservan todos.
+    """
+    n = len(x)
+    if n_salida >= n or n_salida < 3:
+        return np.arange(n)
+
+    indices = np.empty(n_salida, dtype=np.int64)
+    indices[0] = 0
+    indices[n_salida - 1] = n - 1
+
+    # Los puntos interiores se reparten en n_salida - 2 baldes
+    ancho = (n - 2) / (n_salida - 2)
+    a = 0
+
+    for i in range(n_salida - 2):
+        inicio = int(i * ancho) + 1
+        fin = int((i + 1) * ancho) + 1
+
+        # Promedio del balde siguiente (el último punto para el último balde)
+        inicio_sig = fin
+        fin_sig = min(int((i + 2) * ancho) + 1, n)
+        x_prom = 0.0
+        y_prom = 0.0
+        for j in range(inicio_sig, fin_sig):
+            x_prom += x[j]
+            y_prom += y[j]
+        x_prom /= fin_sig - inicio_sig
+        y_prom /= fin_sig - inicio_sig
+
+        # Punto del balde que forma el triángulo de mayor área
+        area_max = -1.0
+        elegido = inicio
+        for j in range(inicio, fin):
+            area = abs((x[a] - x_prom) * (y[j] - y[a]) -
+                       (x[a] - x[j]) * (y_prom - y[a]))
+            if area > area_max:
+                area_max = area
+                elegido = j
+
+        indices[i + 1] = elegido
+        a = elegido
+
+    return indices
+
+
+def precompilar_lttb():
+    """
+    Fuerza la compilación (o la carga desde la caché en disco) del kernel
+    para no pagar el JIT en el primer gráfico. Las series llegan como
+    vistas de solo lectura del historial, que Numba compila como un tipo
+    distinto de los arreglos escribibles: se calienta con ese mismo tipo.
+    """
+    x = np.arange(8, dtype=np.float64)
+    x.flags.writeable = False
+    indices_lttb(x, x, 4)